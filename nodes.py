@@ -1,8 +1,14 @@
+import functools
 import os
-from typing import Tuple
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
 
 import comfy.sd
 import comfy.utils
+import numpy as np
 import torch
 import torch.nn.functional as F
 from comfy.sd import CLIP
@@ -13,8 +19,32 @@ from torch import Tensor
 import requests
 import hashlib
 import math
-
-
+import re
+
+# pool for resolving several lora urls at once
+_DL_POOL = ThreadPoolExecutor(max_workers=4)
+# one lock per url so concurrent requests for the same file only download it once
+_URL_LOCKS = defaultdict(threading.Lock)
+_URL_LOCKS_GUARD = threading.Lock()
+# https://huggingface.co/<owner>/<repo>/(blob|resolve)/<revision>/[<subfolder>/]<filename>
+_HF_URL_RE = re.compile(
+    r"^https?://(?:www\.)?huggingface\.co/(?P<repo_id>[^/]+/[^/]+)/(?:blob|resolve)/(?P<revision>[^/]+)/"
+    r"(?:(?P<subfolder>.+)/)?(?P<filename>[^/]+)$"
+)
+
+# strings accepted by float(); the "int" group is set when int() accepts them too
+_NUMBER_DIGITS = r"\d(?:_?\d)*"
+_NUMBER_RE = re.compile(
+    rf"[+-]?(?:(?P<int>{_NUMBER_DIGITS})"
+    rf"|(?:{_NUMBER_DIGITS}\.(?:{_NUMBER_DIGITS})?|\.{_NUMBER_DIGITS})(?:[eE][+-]?{_NUMBER_DIGITS})?"
+    rf"|{_NUMBER_DIGITS}[eE][+-]?{_NUMBER_DIGITS}"
+    r"|(?i:inf|infinity|nan))"
+)
+
+
+# the cwd and cache layout do not change while comfy runs, resolve once.
+# call find_or_create_cache.cache_clear() after a chdir
+@functools.lru_cache(maxsize=1)
 def find_or_create_cache():
     cwd = os.getcwd()
     if os.path.exists(os.path.join(cwd, "ComfyUI")):
@@ -31,21 +61,87 @@ def find_or_create_cache():
 def download_file(url, filename):
     # make dirs recursively
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    response = requests.get(url, allow_redirects=True)
-    if response.status_code == 200:
-        with open(filename, 'wb') as file:
-            file.write(response.content)
-    else:
-        raise Exception(f"Failed to download file. Status code: {response.status_code}")
+
+    # stream into a .part file, left in place on failure so the next call can resume it
+    part_filename = filename + ".part"
+    resume_byte = os.path.getsize(part_filename) if os.path.exists(part_filename) else 0
+    headers = {"Range": f"bytes={resume_byte}-"} if resume_byte else {}
+
+    with requests.get(url, headers=headers, stream=True, allow_redirects=True, timeout=30) as response:
+        if response.status_code == 416 and resume_byte:
+            # the .part file does not fit the remote file anymore, start over
+            os.remove(part_filename)
+            return download_file(url, filename)
+        if response.status_code == 206:
+            mode = 'ab'
+        elif response.status_code == 200:
+            # server ignored the range request, restart from the beginning
+            mode = 'wb'
+            resume_byte = 0
+        else:
+            raise Exception(f"Failed to download file. Status code: {response.status_code}")
+
+        # Content-Length counts encoded bytes, only compare it against raw transfers
+        content_length = None
+        if response.headers.get("Content-Encoding", "identity") == "identity":
+            content_length = response.headers.get("Content-Length")
+        with open(part_filename, mode) as file:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                file.write(chunk)
+
+    if content_length is not None:
+        expected_size = resume_byte + int(content_length)
+        actual_size = os.path.getsize(part_filename)
+        if actual_size != expected_size:
+            raise Exception(f"Incomplete download. Expected {expected_size} bytes, got {actual_size}")
+
+    os.replace(part_filename, filename)
 
 
 def get_filename_from_url(url: str, extension: str):
-    # md5 hash the url to get a unique filename
-    filename = hashlib.md5(url.encode()).hexdigest()
+    # hash the url to get a unique filename
+    filename = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
     return f"{filename}.{extension}"
 
 
-def get_lora_from_url(url: str):
+def migrate_legacy_download(url: str, path: str):
+    # downloads used to be named after the md5 of the url, rename them instead of downloading again
+    if os.path.exists(path):
+        return
+    directory, filename = os.path.split(path)
+    extension = filename.rsplit(".", 1)[-1]
+    legacy_hash = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    legacy_path = os.path.join(directory, f"{legacy_hash}.{extension}")
+    if os.path.exists(legacy_path):
+        os.replace(legacy_path, path)
+
+
+def parse_hf_url(url: str) -> Tuple[str, str, Optional[str], str]:
+    """Split a Hugging Face file url into (repo_id, revision, subfolder, filename)."""
+    # drop the query (e.g. ?download=true) and any trailing slash - HF
+    parts = urlsplit(url.strip())
+    path_url = f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}"
+
+    if not path_url.lower().endswith("safetensors"):
+        raise ValueError("Only safetensors files are supported.")
+
+    # https://huggingface.co/owner_name/repo_name/resolve/main/subfolder/file_name.safetensors
+    # blob urls copied from the browser are accepted as well
+    match = _HF_URL_RE.match(path_url)
+    if match is None:
+        raise ValueError("Invalid Hugging Face URL")
+
+    # hf_hub_download quotes these itself, pass them decoded (e.g. refs%2Fpr%2F3 -> refs/pr/3)
+    subfolder = match["subfolder"]
+    return (
+        match["repo_id"],
+        unquote(match["revision"]),
+        None if subfolder is None else unquote(subfolder),
+        unquote(match["filename"]),
+    )
+
+
+def _resolve_lora_path(url: str):
     # clean the url
     url = url.strip()
 
@@ -57,40 +153,12 @@ def get_lora_from_url(url: str):
 
     if "huggingface.co" in url:
         # use hf hub download because it is faster
-        # strip the download=true query parameter - HF
-        if url.endswith("?download=true"):
-            url = url[:-len("?download=true")]
-
-        # handle user copying the blob url - HF
-        if '/blob/' in url:
-            url = url.replace('/blob/', '/resolve/')
-
-        # https://huggingface.co/owner_name/repo_name/resolve/main/file_name.safetensors
-
-        if not url.lower().endswith("safetensors"):
-            raise ValueError("Only safetensors files are supported.")
-
-        # parse hf repo from url
-        parser_string = url.replace("http://", "").replace("https://", "")
-        parts = parser_string.split("/")
-        # ['huggingface.co', 'owner_name', 'repo_name', 'resolve', 'main', 'file_name.safetensors']
-
-        # remove chunks that are not needed
-        repo_id = parts[1] + "/" + parts[2]
-        filename = parts[-1]
-
-        # extract any depth of subfolders
-        # ['huggingface.co', 'owner_name', 'repo_name', 'resolve', 'main', 'subfolder', 'sub-subfolder', 'file_name.safetensors']
-        subfolder = None
-        subfolder_length = len(parts) - 6
-
-        if subfolder_length > 0:
-            subfolder = "/".join(parts[5:-1])
-
+        repo_id, revision, subfolder, filename = parse_hf_url(url)
         lora_path = hf_hub_download(
-            repo_id=repo_id.strip(),
-            filename=filename.strip(),
+            repo_id=repo_id,
+            filename=filename,
             subfolder=subfolder,
+            revision=revision,
             cache_dir=find_or_create_cache(),
         )
     elif "civitai.com" in url:
@@ -107,6 +175,8 @@ def get_lora_from_url(url: str):
             raise ValueError("Only safetensors files are supported for security reasons.")
 
         save_filename = get_filename_from_url(url, "safetensors")
+        lora_path = os.path.join(find_or_create_cache(), 'civitai', save_filename)
+        migrate_legacy_download(url, lora_path)
 
         # check if env var for CIVITAI_API_KEY is set. Add after hashing the url
         if "CIVITAI_API_KEY" in os.environ:
@@ -116,7 +186,6 @@ def get_lora_from_url(url: str):
                 url += f"&token={api_key}"
 
         # download the file
-        lora_path = os.path.join(find_or_create_cache(), 'civitai', save_filename)
         # check if the file already exists
         if not os.path.exists(lora_path):
             # will fail for most if api key not set
@@ -129,6 +198,7 @@ def get_lora_from_url(url: str):
         # try to download the file
         save_filename = get_filename_from_url(url, "safetensors")
         lora_path = os.path.join(find_or_create_cache(), 'general', save_filename)
+        migrate_legacy_download(url, lora_path)
         # check if the file already exists
         if not os.path.exists(lora_path):
             download_file(url, lora_path)
@@ -136,6 +206,42 @@ def get_lora_from_url(url: str):
     return lora_path
 
 
+def get_lora_from_url(url: str):
+    with _URL_LOCKS_GUARD:
+        lock = _URL_LOCKS[url.strip()]
+    with lock:
+        return _resolve_lora_path(url)
+
+
+def get_loras_from_urls(urls: List[str]) -> List[str]:
+    """Download several loras in parallel. Returns the local paths in the order of urls."""
+    return list(_DL_POOL.map(get_lora_from_url, urls))
+
+
+# loaded lora state dicts shared by the lora loaders, least recently used first
+_LORA_CACHE = OrderedDict()
+_LORA_CACHE_MAX_BYTES = 4 << 30
+
+
+def _get_cached_lora(lora_path: str):
+    if lora_path in _LORA_CACHE:
+        _LORA_CACHE.move_to_end(lora_path)
+        return _LORA_CACHE[lora_path][0]
+
+    lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
+    _LORA_CACHE[lora_path] = (lora, sum(t.nbytes for t in lora.values()))
+
+    # evict least recently used loras until under budget, always keeping the one just loaded
+    while len(_LORA_CACHE) > 1 and sum(size for _, size in _LORA_CACHE.values()) > _LORA_CACHE_MAX_BYTES:
+        _LORA_CACHE.popitem(last=False)
+
+    return lora
+
+
+# (model id, dtype) -> loaded ConsistencyDecoderVAE
+_CONSISTENCY_VAE_CACHE = {}
+
+
 class ConsistencyDecoder:
     CATEGORY = "latent"
     @classmethod
@@ -145,17 +251,21 @@ class ConsistencyDecoder:
     FUNCTION = "decode"
 
     def __init__(self):
-        self.vae = (
-            ConsistencyDecoderVAE.from_pretrained(
-                "openai/consistency-decoder",
-                torch_dtype=torch.float16,
-                variant="fp16",
-                use_safetensors=True,
-                cache_dir=find_or_create_cache(),
+        # the weights are only read at decode time, so every node shares one copy
+        key = ("openai/consistency-decoder", torch.float16)
+        if key not in _CONSISTENCY_VAE_CACHE:
+            _CONSISTENCY_VAE_CACHE[key] = (
+                ConsistencyDecoderVAE.from_pretrained(
+                    key[0],
+                    torch_dtype=key[1],
+                    variant="fp16",
+                    use_safetensors=True,
+                    cache_dir=find_or_create_cache(),
+                )
+                .eval()
+                .to("cuda")
             )
-            .eval()
-            .to("cuda")
-        )
+        self.vae = _CONSISTENCY_VAE_CACHE[key]
 
     def _decode(self, latent):
         """Used when patching another vae."""
@@ -164,7 +274,8 @@ class ConsistencyDecoder:
     def decode(self, latent):
         """Used for standalone decoding."""
         sample = self._decode(latent["samples"])
-        sample = sample.clamp(-1, 1).movedim(1, -1).add(1.0).mul(0.5).cpu()
+        # postprocess in fp16 on the gpu and only copy half the bytes to the cpu
+        sample = sample.clamp(-1, 1).movedim(1, -1).add(1.0).mul(0.5).cpu().float()
         return (sample,)
 
 
@@ -183,20 +294,39 @@ class PatchDecoderTiled:
     def patch(self, vae):
         del vae.first_stage_model.decoder
         vae.first_stage_model.decode = self.vae._decode
-        vae.decode = (
-            lambda x: vae.decode_tiled_(
-                x,
-                tile_x=512,
-                tile_y=512,
-                overlap=64,
-            )
-            .to("cuda")
-            .movedim(1, -1)
-        )
+        # decode_tiled_ already returns the image on the vae output device, like comfy's own decode
+        vae.decode = lambda x: vae.decode_tiled_(
+            x,
+            tile_x=512,
+            tile_y=512,
+            overlap=64,
+        ).movedim(1, -1)
 
         return (vae,)
 
 
+# (aspect ratio, width, height), sorted by aspect ratio
+_SDXL_ASPECT_RATIOS = sorted(
+    (
+        (1 / 1, 1024, 1024),
+        (2 / 3, 832, 1216),
+        (3 / 4, 896, 1152),
+        (5 / 8, 768, 1216),
+        (9 / 16, 768, 1344),
+        (9 / 19, 704, 1472),
+        (9 / 21, 640, 1536),
+        (3 / 2, 1216, 832),
+        (4 / 3, 1152, 896),
+        (8 / 5, 1216, 768),
+        (16 / 9, 1344, 768),
+        (19 / 9, 1472, 704),
+        (21 / 9, 1536, 640),
+    )
+)
+_SDXL_RATIOS = np.array([ratio for ratio, _, _ in _SDXL_ASPECT_RATIOS])
+_SDXL_SIZES = np.array([(w, h) for _, w, h in _SDXL_ASPECT_RATIOS], dtype=np.int32)
+
+
 # quick node to set SDXL-friendly aspect ratios in 1024^2
 # adapted from throttlekitty
 class SDXLAspectRatio:
@@ -220,26 +350,17 @@ class SDXLAspectRatio:
         _, height, width, _ = image.shape
         aspect_ratio = width / height
 
-        aspect_ratios = (
-            (1 / 1, 1024, 1024),
-            (2 / 3, 832, 1216),
-            (3 / 4, 896, 1152),
-            (5 / 8, 768, 1216),
-            (9 / 16, 768, 1344),
-            (9 / 19, 704, 1472),
-            (9 / 21, 640, 1536),
-            (3 / 2, 1216, 832),
-            (4 / 3, 1152, 896),
-            (8 / 5, 1216, 768),
-            (16 / 9, 1344, 768),
-            (19 / 9, 1472, 704),
-            (21 / 9, 1536, 640),
-        )
-
-        # find the closest aspect ratio
-        closest = min(aspect_ratios, key=lambda x: abs(x[0] - aspect_ratio))
+        # find the closest aspect ratio: binary search, then pick the nearer neighbour.
+        # ties go to the ratio closer to 1:1
+        i = int(np.searchsorted(_SDXL_RATIOS, aspect_ratio))
+        i = min(max(i, 1), len(_SDXL_RATIOS) - 1)
+        below = aspect_ratio - _SDXL_RATIOS[i - 1]
+        above = _SDXL_RATIOS[i] - aspect_ratio
+        if below < above or (below == above and _SDXL_RATIOS[i - 1] >= 1):
+            i -= 1
 
-        return (closest[1], closest[2])
+        width, height = _SDXL_SIZES[i].tolist()
+        return (width, height)
 
 
 class ImageToMultipleOf:
@@ -275,20 +396,23 @@ class ImageToMultipleOf:
         new_width = width - (width % multiple_of)
 
         if method == "rescale":
+            # interpolate works on (B, C, H, W)
             return (
                 F.interpolate(
-                    image.unsqueeze(0),
+                    image.permute(0, 3, 1, 2),
                     size=(new_height, new_width),
                     mode="bilinear",
                     align_corners=False,
-                ).squeeze(0),
+                )
+                .permute(0, 2, 3, 1)
+                .contiguous(),
             )
         else:
             top = (height - new_height) // 2
             left = (width - new_width) // 2
             bottom = top + new_height
             right = left + new_width
-            return (image[:, top:bottom, left:right, :],)
+            return (image[:, top:bottom, left:right, :].contiguous(),)
 
 
 class HFHubLoraLoader:
@@ -315,10 +439,6 @@ class HFHubLoraLoader:
     RETURN_TYPES = ("MODEL", "CLIP")
     FUNCTION = "load_lora"
 
-    def __init__(self):
-        self.loaded_lora = None
-        self.loaded_lora_path = None
-
     def load_lora(
         self,
         model,
@@ -341,20 +461,7 @@ class HFHubLoraLoader:
             cache_dir=find_or_create_cache(),
         )
 
-        lora = None
-        if self.loaded_lora is not None:
-            if self.loaded_lora_path == lora_path:
-                lora = self.loaded_lora
-            else:
-                temp = self.loaded_lora
-                self.loaded_lora = None
-                del temp
-                self.loaded_lora_path = None
-
-        if lora is None:
-            lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-            self.loaded_lora = lora
-            self.loaded_lora_path = lora_path
+        lora = _get_cached_lora(lora_path)
 
         model_lora, clip_lora = comfy.sd.load_lora_for_models(
             model, clip, lora, strength_model, strength_clip
@@ -440,17 +547,95 @@ class GlifVariable:
         int_val = 0
         float_val = 0.0
         string_val = f"{variable}"
-        try:
-            int_val = int(variable)
-        except Exception as _:
-            pass
-        try:
+        # classify first so plain strings skip the failing int/float conversions
+        match = _NUMBER_RE.fullmatch(variable)
+        if match is not None:
             float_val = float(variable)
-        except Exception as _:
-            pass
+            if match["int"] is not None:
+                try:
+                    int_val = int(variable)
+                except ValueError:
+                    # more digits than sys.get_int_max_str_digits() allows
+                    pass
         return (string_val, int_val, float_val)
 
 
+_LUMA_WEIGHTS = torch.tensor([0.299, 0.587, 0.114], dtype=torch.float32)
+
+
+def _luma(image: Tensor) -> Tensor:
+    """(B, C, H, W) channels_last RGB -> (B, 1, H, W) luma."""
+    # channels_last is laid out as (B, H, W, C), so this is a single matvec over the channels
+    weights = _LUMA_WEIGHTS.to(device=image.device, dtype=image.dtype)
+    return (image[:, :3].permute(0, 2, 3, 1) @ weights).unsqueeze(1)
+
+
+# sum of the squared luma weights, the variance of the luma of unit color noise
+_LUMA_SQUARED_SUM = 0.299**2 + 0.587**2 + 0.114**2
+
+
+def _grain_core(
+    image: Tensor,
+    mono_noise: Tensor,
+    color_noise: Optional[Tensor],
+    intensity: float,
+    grain_size: float,
+    grain_saturation: float,
+    brightness_impact: float,
+    image_saturation: float,
+    color_mode: bool,
+) -> Tensor:
+    """Film grain on a (B, C, H, W) channels_last image.
+
+    Returns (B, C, H, W) in color mode and the single luma channel (B, 1, H, W) otherwise.
+
+    mono_noise is (B, 1, h, w) and color_noise is (B, C, h, w), both at the grain resolution.
+    color_noise is only used in color mode and may be None otherwise.
+    """
+    _, channels, height, width = image.shape
+
+    if color_mode:
+        # Blend monochrome and color noise based on saturation, in place at the grain resolution.
+        # mono_noise broadcasts over the channel dim, so it is never materialized per channel.
+        noise = color_noise.mul_(grain_saturation).add_(mono_noise, alpha=1 - grain_saturation)
+    else:
+        # Black and white keeps only the luma of the image and the grain. The luma of the blended
+        # noise is normal with this std, so scaled mono noise has the same distribution.
+        noise = mono_noise.mul_(math.sqrt((1 - grain_saturation) ** 2 + grain_saturation**2 * _LUMA_SQUARED_SUM))
+        image = _luma(image)
+
+    # Resize noise if necessary
+    if grain_size != 1.0:
+        noise = F.interpolate(
+            noise.contiguous(memory_format=torch.channels_last),
+            size=(height, width),
+            mode="bilinear",
+            align_corners=False,
+        )
+
+    # Calculate brightness for brightness-dependent grain
+    brightness = _luma(image) if color_mode else image
+
+    # Modulate noise intensity based on brightness
+    brightness_factor = brightness.mul(brightness_impact).add_(1 - brightness_impact)
+
+    # Apply noise with brightness adjustment. noise is owned here, so turn it into the grain in place
+    noise.sub_(0.5).mul_(intensity).mul_(brightness_factor)
+    grainy_img = torch.add(image, noise)
+
+    # Apply image saturation adjustment in color mode
+    if color_mode:
+        # Scaling HSV saturation by k keeps hue and value, which is the same as pulling each
+        # channel towards the value (max channel): rgb' = v + k * (rgb - v). k is limited to
+        # v / (max - min) so the scaled saturation never exceeds 1, as the HSV clamp did.
+        v = grainy_img.amax(dim=1, keepdim=True)
+        diff = v - grainy_img.amin(dim=1, keepdim=True)
+        scale = torch.where(diff > 0, v / diff, torch.zeros_like(v)).clamp_(0, image_saturation)
+        grainy_img.sub_(v).mul_(scale).add_(v)
+
+    return grainy_img.clamp_(0, 1)
+
+
 class FilmGrainNode:
     CATEGORY = "image/postprocessing"
     @classmethod
@@ -494,91 +679,65 @@ class FilmGrainNode:
     RETURN_TYPES = ("IMAGE",)
     FUNCTION = "apply_film_grain"
 
+    def __init__(self):
+        self._noise_buf = None
+        self._gen = None
+
+    def _fill_noise(self, shape: Tuple[int, ...], device: torch.device, dtype: torch.dtype) -> Tensor:
+        """Fill a view of the reusable noise buffer with standard normal noise."""
+        buf = self._noise_buf
+        same_kind = buf is not None and buf.device == device and buf.dtype == dtype
+        if not same_kind or any(have < need for have, need in zip(buf.shape, shape)):
+            alloc_shape = shape
+            if same_kind:
+                alloc_shape = tuple(max(have, need) for have, need in zip(buf.shape, shape))
+            self._noise_buf = buf = torch.empty(alloc_shape, device=device, dtype=dtype)
+
+        if self._gen is None or self._gen.device != device:
+            self._gen = torch.Generator(device=device)
+        # reseed from the global RNG so the grain still follows the workflow seed
+        self._gen.manual_seed(int(torch.randint(0, 2**63 - 1, (1,)).item()))
+
+        noise = buf[tuple(slice(0, n) for n in shape)]
+        return noise.normal_(generator=self._gen)
+
     def apply_film_grain(self, image, intensity, grain_size, grain_saturation, brightness_impact, image_saturation, mode):
-        device = image.device
         batch_size, height, width, channels = image.shape
-
-        # Generate base noise
+        color_mode = mode == "Color"
+        # grain is memory bound, half precision halves the traffic on gpu. Elementwise ops are not
+        # covered by autocast, so convert explicitly. fp16 rather than bf16 to keep 8-bit precision
+        dtype = image.dtype
+        compute_dtype = torch.float16 if image.is_cuda else dtype
+
+        # Generate monochrome and color noise in one buffer: channel 0 is mono, the rest is color.
+        # Black and white only needs the mono channel
         noise_h, noise_w = max(1, int(height / grain_size)), max(1, int(width / grain_size))
-        
-        # Generate monochrome noise
-        mono_noise = torch.randn(batch_size, noise_h, noise_w, 1, device=device)
-
-        # Generate color noise
-        color_noise = torch.randn(batch_size, noise_h, noise_w, channels, device=device)
-
-        # Blend monochrome and color noise based on saturation
-        noise = mono_noise.repeat(1, 1, 1, channels) * (1 - grain_saturation) + color_noise * grain_saturation
-
-        # Resize noise if necessary
-        if grain_size != 1.0:
-            noise = torch.nn.functional.interpolate(noise.permute(0, 3, 1, 2), 
-                                                    size=(height, width), 
-                                                    mode='bilinear', 
-                                                    align_corners=False)
-            noise = noise.permute(0, 2, 3, 1)
-
-        # Calculate brightness for brightness-dependent grain
-        brightness = 0.299 * image[..., 0] + 0.587 * image[..., 1] + 0.114 * image[..., 2]
-
-        # Modulate noise intensity based on brightness
-        brightness_factor = (1 - brightness_impact) + brightness_impact * brightness.unsqueeze(-1)
-        
-        # Apply noise with brightness adjustment
-        grain = (noise - 0.5) * intensity * brightness_factor
-        grainy_img = image + grain
-
-        # Apply image saturation adjustment in color mode
-        if mode == "Color":
-            # Convert to HSV
-            r, g, b = grainy_img[..., 0], grainy_img[..., 1], grainy_img[..., 2]
-            max_rgb, _ = torch.max(grainy_img, dim=-1)
-            min_rgb, _ = torch.min(grainy_img, dim=-1)
-            diff = max_rgb - min_rgb
-
-            # Value
-            v = max_rgb
-
-            # Saturation
-            s = torch.where(v != 0, diff / v, torch.zeros_like(v))
-
-            # Hue
-            h = torch.zeros_like(s)
-            h[r == v] = (60 * (g[r == v] - b[r == v]) / diff[r == v] % 360) / 360
-            h[g == v] = (120 + 60 * (b[g == v] - r[g == v]) / diff[g == v]) / 360
-            h[b == v] = (240 + 60 * (r[b == v] - g[b == v]) / diff[b == v]) / 360
-
-            # Adjust saturation
-            s = torch.clamp(s * image_saturation, 0, 1)
-
-            # Convert back to RGB
-            c = v * s
-            x = c * (1 - torch.abs((h * 6) % 2 - 1))
-            m = v - c
-
-            rgb = torch.zeros_like(grainy_img)
-            mask = (h < 1/6)
-            rgb[mask] = torch.stack([c[mask], x[mask], torch.zeros_like(x[mask])], dim=-1)
-            mask = (1/6 <= h) & (h < 2/6)
-            rgb[mask] = torch.stack([x[mask], c[mask], torch.zeros_like(x[mask])], dim=-1)
-            mask = (2/6 <= h) & (h < 3/6)
-            rgb[mask] = torch.stack([torch.zeros_like(x[mask]), c[mask], x[mask]], dim=-1)
-            mask = (3/6 <= h) & (h < 4/6)
-            rgb[mask] = torch.stack([torch.zeros_like(x[mask]), x[mask], c[mask]], dim=-1)
-            mask = (4/6 <= h) & (h < 5/6)
-            rgb[mask] = torch.stack([x[mask], torch.zeros_like(x[mask]), c[mask]], dim=-1)
-            mask = (5/6 <= h)
-            rgb[mask] = torch.stack([c[mask], torch.zeros_like(x[mask]), x[mask]], dim=-1)
-
-            grainy_img = rgb + m.unsqueeze(-1)
-
-        elif mode == "Black and White":
-            grainy_img = 0.299 * grainy_img[..., 0] + 0.587 * grainy_img[..., 1] + 0.114 * grainy_img[..., 2]
-            grainy_img = grainy_img.unsqueeze(-1).repeat(1, 1, 1, 3)
-
-        grainy_img = torch.clamp(grainy_img, 0, 1)
-
-        return (grainy_img,)
+        noise_channels = channels + 1 if color_mode else 1
+        noise = self._fill_noise(
+            (batch_size, noise_h, noise_w, noise_channels), image.device, compute_dtype
+        ).permute(0, 3, 1, 2)
+
+        # (B, H, W, C) -> (B, C, H, W); the permuted view of a contiguous NHWC tensor is already channels_last
+        image = image.permute(0, 3, 1, 2).to(dtype=compute_dtype, memory_format=torch.channels_last)
+
+        grainy_img = _grain_core(
+            image,
+            noise[:, :1],
+            noise[:, 1:] if color_mode else None,
+            intensity,
+            grain_size,
+            grain_saturation,
+            brightness_impact,
+            image_saturation,
+            color_mode,
+        ).to(dtype)
+
+        if not color_mode:
+            # broadcast the single luma channel to RGB without copying
+            grainy_img = grainy_img.expand(-1, 3, -1, -1)
+
+        # channels_last (B, C, H, W) is already laid out as (B, H, W, C), so this is a view
+        return (grainy_img.permute(0, 2, 3, 1),)
 
 
 class LoraLoaderFromURL:
@@ -605,10 +764,6 @@ class LoraLoaderFromURL:
     RETURN_TYPES = ("MODEL", "CLIP")
     FUNCTION = "load_lora"
 
-    def __init__(self):
-        self.loaded_lora = None
-        self.loaded_lora_path = None
-
     def load_lora(
             self,
             model,
@@ -622,20 +777,7 @@ class LoraLoaderFromURL:
 
         lora_path = get_lora_from_url(url)
 
-        lora = None
-        if self.loaded_lora is not None:
-            if self.loaded_lora_path == lora_path:
-                lora = self.loaded_lora
-            else:
-                temp = self.loaded_lora
-                self.loaded_lora = None
-                del temp
-                self.loaded_lora_path = None
-
-        if lora is None:
-            lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-            self.loaded_lora = lora
-            self.loaded_lora_path = lora_path
+        lora = _get_cached_lora(lora_path)
 
         model_lora, clip_lora = comfy.sd.load_lora_for_models(
             model, clip, lora, strength_model, strength_clip
@@ -700,25 +842,23 @@ class ImagePaddingAdvanced:
         pad_left = pad_width // 2 
         pad_right = pad_width - pad_left
 
+        # pad H and W of a (B, C, H, W) view so reflect/replicate use the 2D pad kernels
+        image = image.permute(0, 3, 1, 2)
+        padding = (pad_left, pad_right, pad_top, pad_bottom)
+
         if method == "constant":
             # Pad with zeros (black)
-            padded = torch.nn.functional.pad(
-                image, (0, 0, pad_left, pad_right, pad_top, pad_bottom), mode="constant", value=0
-            )
-            
+            padded = torch.nn.functional.pad(image, padding, mode="constant", value=0)
+
         elif method == "replicate":
             # Extend edge pixels
-            padded = torch.nn.functional.pad(
-                image, (0, 0, pad_left, pad_right, pad_top, pad_bottom), mode="replicate"
-            )
-            
+            padded = torch.nn.functional.pad(image, padding, mode="replicate")
+
         else: # mirror
             # Mirror padding
-            padded = torch.nn.functional.pad(
-                image, (0, 0, pad_left, pad_right, pad_top, pad_bottom), mode="reflect"
-            )
+            padded = torch.nn.functional.pad(image, padding, mode="reflect")
 
-        return (padded,)
+        return (padded.permute(0, 2, 3, 1).contiguous(),)
     
 class FluxReduxFloatRamp:
     """
@@ -744,36 +884,65 @@ class FluxReduxFloatRamp:
     RETURN_NAMES = ("value",)
     FUNCTION = "get_value"
 
-    def ease_in(self, x):
+    def __init__(self):
+        # (ramp_type, steps_threshold) -> ramp value for every step
+        self._ramp_cache = {}
+
+    # the easing functions work on scalars and numpy arrays alike
+
+    @staticmethod
+    def ease_in(x):
         return x * x
 
-    def ease_out(self, x):
+    @staticmethod
+    def ease_out(x):
         return 1 - (1 - x) * (1 - x)
 
-    def ease_in_out(self, x):
+    @staticmethod
+    def ease_in_out(x):
         return x * x * (3 - 2 * x)
 
-    def exponential(self, x):
-        return (math.exp(x) - 1) / (math.exp(1) - 1)
+    @staticmethod
+    def exponential(x):
+        return (np.exp(x) - 1) / (np.e - 1)
 
-    def smoothstep(self, x):
+    @staticmethod
+    def smoothstep(x):
         return x * x * (3 - 2 * x)
 
-    def bounce(self, x):
+    @staticmethod
+    def bounce(x):
         n1 = 7.5625
         d1 = 2.75
 
-        if x < 1 / d1:
-            return n1 * x * x
-        elif x < 2 / d1:
-            x -= 1.5 / d1
-            return n1 * x * x + 0.75
-        elif x < 2.5 / d1:
-            x -= 2.25 / d1
-            return n1 * x * x + 0.9375
-        else:
-            x -= 2.625 / d1
-            return n1 * x * x + 0.984375
+        x = np.asarray(x)
+        c1 = x < 1 / d1
+        c2 = (x < 2 / d1) & ~c1
+        c3 = (x < 2.5 / d1) & ~(c1 | c2)
+        shifted = np.where(c2, x - 1.5 / d1, np.where(c3, x - 2.25 / d1, x - 2.625 / d1))
+        base = np.where(c2, 0.75, np.where(c3, 0.9375, 0.984375))
+        return np.where(c1, n1 * x * x, n1 * shifted * shifted + base)
+
+    def get_ramp(self, ramp_type, steps_threshold):
+        """Ramp values for steps 1..steps_threshold, computed once per (ramp_type, steps_threshold)."""
+        key = (ramp_type, steps_threshold)
+        if key not in self._ramp_cache:
+            # Calculate basic progress
+            progress = np.arange(1, steps_threshold + 1) / steps_threshold
+
+            # Apply the selected ramp function, falling back to linear
+            ramp_functions = {
+                "ease_in": self.ease_in,
+                "ease_out": self.ease_out,
+                "ease_in_out": self.ease_in_out,
+                "exponential": self.exponential,
+                "smoothstep": self.smoothstep,
+                "bounce": self.bounce,
+            }
+            ramp_function = ramp_functions.get(ramp_type)
+            self._ramp_cache[key] = progress if ramp_function is None else ramp_function(progress)
+
+        return self._ramp_cache[key]
 
     def get_value(self, start, end, steps_threshold, ramp_type):
         current_step = getattr(self, 'i', 0) + 1
@@ -781,27 +950,8 @@ class FluxReduxFloatRamp:
 
         if current_step > steps_threshold:
             return (end,)
-        
-        # Calculate basic progress
-        progress = current_step / steps_threshold
-
-        # Apply the selected ramp function
-        if ramp_type == "linear":
-            modified_progress = progress
-        elif ramp_type == "ease_in":
-            modified_progress = self.ease_in(progress)
-        elif ramp_type == "ease_out":
-            modified_progress = self.ease_out(progress)
-        elif ramp_type == "ease_in_out":
-            modified_progress = self.ease_in_out(progress)
-        elif ramp_type == "exponential":
-            modified_progress = self.exponential(progress)
-        elif ramp_type == "smoothstep":
-            modified_progress = self.smoothstep(progress)
-        elif ramp_type == "bounce":
-            modified_progress = self.bounce(progress)
-        else:
-            modified_progress = progress  # fallback to linear
+
+        modified_progress = float(self.get_ramp(ramp_type, steps_threshold)[current_step - 1])
 
         # Calculate final value
         value = start + (end - start) * modified_progress
@@ -0,0 +1,46 @@
+import math
+import sys
+
+sys.path.append("./")
+sys.path.append("../../")
+
+from nodes import GlifVariable
+
+
+def classify_with_try_except(variable: str):
+    """The conversion GlifVariable used before the regex classification."""
+    int_val = 0
+    float_val = 0.0
+    try:
+        int_val = int(variable)
+    except Exception as _:
+        pass
+    try:
+        float_val = float(variable)
+    except Exception as _:
+        pass
+    return (variable, int_val, float_val)
+
+
+def test_glif_variable():
+    node = GlifVariable()
+
+    cases = [
+        "1", "-1", "+1.5", "007", "1_000", "1__0", "_1", "1_", "1_0.5",
+        "inf", "-Infinity", "nan", "NaN", "5.", ".5", ".5e3", "1e5", "1E-3", "1e", "e5",
+        "١٢", "١٫٢", "0x10", "1.2.3", ".", "+", "hello",
+        "9" * 5000,
+    ]
+    for variable in cases:
+        expected = classify_with_try_except(variable)
+        result = node.do_it(variable, "")
+        assert result[0] == expected[0], variable
+        assert result[1] == expected[1] and type(result[1]) is int, variable
+        assert result[2] == expected[2] or (math.isnan(result[2]) and math.isnan(expected[2])), variable
+
+    # empty and template variables use the fallback
+    assert node.do_it("", "3") == ("3", 3, 3.0)
+    assert node.do_it("{var}", "x") == ("x", 0, 0.0)
+
+if __name__ == "__main__":
+    test_glif_variable()
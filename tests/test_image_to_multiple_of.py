@@ -0,0 +1,25 @@
+import sys
+
+sys.path.append("./")
+sys.path.append("../../")
+
+import torch
+
+from nodes import ImageToMultipleOf
+
+
+def test_image_to_multiple_of():
+    test_image = torch.rand(2, 100, 130, 3)
+
+    node = ImageToMultipleOf()
+
+    for method in ["rescale", "center crop"]:
+        result = node.run(test_image, 64, method)[0]
+        batch, height, width, channels = result.shape
+        assert (batch, channels) == (2, 3)
+        assert height % 64 == 0 and width % 64 == 0
+        assert (height, width) == (64, 128)
+        assert result.is_contiguous()
+
+if __name__ == "__main__":
+    test_image_to_multiple_of()
@@ -0,0 +1,42 @@
+import sys
+
+sys.path.append("./")
+sys.path.append("../../")
+
+from nodes import parse_hf_url
+
+
+def test_parse_hf_url():
+    cases = {
+        "https://huggingface.co/owner/repo/resolve/main/file.safetensors?download=true": (
+            "owner/repo", "main", None, "file.safetensors"
+        ),
+        "https://huggingface.co/owner/repo/blob/main/file.safetensors": (
+            "owner/repo", "main", None, "file.safetensors"
+        ),
+        "https://huggingface.co/owner/repo/resolve/main/file.safetensors/": (
+            "owner/repo", "main", None, "file.safetensors"
+        ),
+        "https://huggingface.co/owner/repo/resolve/main/sub/sub-sub/file.safetensors": (
+            "owner/repo", "main", "sub/sub-sub", "file.safetensors"
+        ),
+        "https://huggingface.co/owner/repo/resolve/refs%2Fpr%2F3/my%20sub/my%20file.safetensors": (
+            "owner/repo", "refs/pr/3", "my sub", "my file.safetensors"
+        ),
+    }
+    for url, expected in cases.items():
+        assert parse_hf_url(url) == expected, url
+
+    for url in [
+        "https://huggingface.co/owner/repo/resolve/main/file.ckpt",
+        "https://huggingface.co/owner/repo/file.safetensors",
+    ]:
+        try:
+            parse_hf_url(url)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(url)
+
+if __name__ == "__main__":
+    test_parse_hf_url()